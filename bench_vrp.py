@@ -0,0 +1,76 @@
+# =============================================================================
+# VRP Benchmark: distance-only vs capacitated/time-windowed (CVRPTW) routing
+# =============================================================================
+# Usage: python bench_vrp.py [--stops 16 100 500] [--budget fast] [--time-limit 10] [--portfolio | --cluster sweep]
+# Synthetic stores are scattered around the Memphis DC with haversine distances, random
+# order quantities and delivery windows, so the numbers are reproducible without any API.
+import argparse
+import logging
+
+import numpy as np
+
+from vrp_solver import (DEFAULT_TIME_WINDOW, SERVICE_TIME_SECONDS, VRP_SOLVE_BUDGETS, haversine_distance_matrix, solve_vrp,
+                        solve_vrp_portfolio, solve_vrp_clustered, CLUSTER_METHODS)
+
+DC_LAT, DC_LONG = 35.0456, -89.7917 # 3610 Hacks Cross Rd, Memphis TN (LOC0)
+STOPS_PER_VEHICLE = 20 # Fleet sized so each rider has ~20 stops
+CAPACITY_SLACK = 1.2
+
+
+def instance_coordinates(num_stops: int, seed: int = 0):
+    """Returns (lats, lons, rng) for the DC plus num_stops - 1 stores; rng continues for the order data."""
+    rng = np.random.default_rng(seed)
+    lats = np.concatenate([[DC_LAT], DC_LAT + rng.normal(0.0, 0.08, num_stops - 1)])
+    lons = np.concatenate([[DC_LONG], DC_LONG + rng.normal(0.0, 0.10, num_stops - 1)])
+    return lats, lons, rng
+
+
+def build_instance(num_stops: int, mode: str, seed: int = 0) -> dict:
+    """Builds a reproducible VRP data dict with the DC as node 0 plus num_stops - 1 stores."""
+    lats, lons, rng = instance_coordinates(num_stops, seed)
+    num_vehicles = max(2, int(np.ceil(num_stops / STOPS_PER_VEHICLE)))
+    data = {"distance_matrix": haversine_distance_matrix(lats, lons), "num_vehicles": num_vehicles, "depot": 0}
+    if mode == "cvrptw":
+        demands = np.concatenate([[0], rng.integers(1, 11, num_stops - 1)]).tolist()
+        capacity = int(np.ceil(CAPACITY_SLACK * sum(demands) / num_vehicles))
+        day_start, day_end = DEFAULT_TIME_WINDOW
+        starts = rng.integers(day_start, day_end - 4 * 3600, num_stops)
+        windows = [DEFAULT_TIME_WINDOW] + [(int(s), int(s) + 4 * 3600) for s in starts[1:]]
+        data.update({"demands": demands, "vehicle_capacities": [capacity] * num_vehicles, "time_windows": windows,
+                     "service_times": [0] + [SERVICE_TIME_SECONDS] * (num_stops - 1)})
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VRP solve time and route quality.")
+    parser.add_argument("--stops", type=int, nargs="+", default=[16, 100, 500])
+    parser.add_argument("--budget", default="fast", choices=sorted(VRP_SOLVE_BUDGETS))
+    parser.add_argument("--time-limit", type=int, default=None, help="Override the budget's time limit (seconds).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--portfolio", action="store_true", help="Race the solver portfolio across CPU cores.")
+    parser.add_argument("--cluster", choices=CLUSTER_METHODS, default=None, help="Cluster-first, route-second decomposition.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    header = f"{'stops':>6} {'mode':>9} {'vehicles':>8} {'used':>5} {'solve_s':>8} {'total_km':>9} {'max_km':>8} {'dropped':>8} {'objective':>12}"
+    print(header); print("-" * len(header))
+    for num_stops in args.stops:
+        for mode in ("distance", "cvrptw"):
+            data = build_instance(num_stops, mode, args.seed)
+            if args.cluster:
+                lats, lons, _ = instance_coordinates(num_stops, args.seed)
+                result = solve_vrp_clustered(data, lats, lons, args.budget, args.time_limit, method=args.cluster)
+            else:
+                solve = solve_vrp_portfolio if args.portfolio else solve_vrp
+                result = solve(data, args.budget, args.time_limit)
+            if result["status"] != "success":
+                print(f"{num_stops:>6} {mode:>9} {data['num_vehicles']:>8} {'-':>5} {'-':>8} {'-':>9} {'-':>8} {'-':>8} {result['message']}"); continue
+            used = sum(1 for route in result["routes"] if route)
+            print(f"{num_stops:>6} {mode:>9} {data['num_vehicles']:>8} {used:>5} {result['solve_seconds']:>8.1f} "
+                  f"{sum(result['route_distances']) / 1000:>9.1f} {result['max_route_distance'] / 1000:>8.1f} "
+                  f"{len(result['dropped_nodes']):>8} {result['objective_value']:>12}"
+                  + (f"  [{result['winning_config']['first_solution_strategy']}/{result['winning_config']['metaheuristic']}]" if result.get("winning_config") else ""))
+
+
+if __name__ == "__main__":
+    main()
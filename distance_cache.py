@@ -0,0 +1,97 @@
+# =============================================================================
+# Persistent Distance-Matrix Cache (shared by int.py and final.py)
+# =============================================================================
+# A content-addressed SQLite store of road distances keyed by the normalized
+# origin/destination pair, with a per-entry TTL and oldest-first eviction. No
+# Streamlit or network access, so it can be exercised against a temp file.
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import urllib.parse
+from typing import List, Dict, Optional
+
+from vrp_solver import UNROUTABLE_DISTANCE
+
+logger = logging.getLogger("IntegratedApp")
+
+# --- Cache Config ---
+DISTANCE_CACHE_PATH = os.environ.get("DISTANCE_CACHE_PATH", "distance_matrix_cache.sqlite3")
+DISTANCE_CACHE_TTL_SECONDS = 30 * 24 * 3600 # Road distances rarely change; refresh monthly
+DISTANCE_CACHE_MAX_ENTRIES = 250000 # Oldest entries are evicted beyond this
+SQLITE_MAX_PARAMETERS = 500 # Keys per IN (...) lookup, below SQLite's bound-parameter limit
+
+
+def normalize_address(address: str) -> str:
+    """Normalizes an address so equivalent spellings share one cache entry."""
+    return " ".join(urllib.parse.unquote_plus(str(address)).lower().replace(",", " ").split())
+
+def distance_cache_key(origin: str, destination: str) -> str:
+    """Content-addressed key for one directed origin/destination pair."""
+    pair = f"{normalize_address(origin)}|{normalize_address(destination)}"
+    return hashlib.sha256(pair.encode("utf-8")).hexdigest()
+
+def open_distance_cache(cache_path: str = DISTANCE_CACHE_PATH) -> Optional[sqlite3.Connection]:
+    """Opens (and creates if needed) the on-disk distance cache; None if it cannot be opened."""
+    try:
+        conn = sqlite3.connect(cache_path, timeout=30)
+        conn.execute("""CREATE TABLE IF NOT EXISTS distance_cache (
+            pair_key TEXT PRIMARY KEY, origin TEXT NOT NULL, destination TEXT NOT NULL,
+            distance_m INTEGER NOT NULL, fetched_at REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_distance_cache_fetched_at ON distance_cache (fetched_at)")
+        return conn
+    except sqlite3.Error as e:
+        logger.warning(f"Distance cache unavailable at {cache_path}: {e}"); return None
+
+def distance_cache_get(origins: List[str], destinations: List[str], ttl_seconds: int = DISTANCE_CACHE_TTL_SECONDS,
+                       cache_path: str = DISTANCE_CACHE_PATH) -> Dict[tuple, int]:
+    """Returns {(origin_idx, dest_idx): meters} for every cached pair fetched within ttl_seconds."""
+    conn = open_distance_cache(cache_path)
+    if conn is None: return {}
+    key_to_cells: Dict[str, List[tuple]] = {}
+    for i, origin in enumerate(origins):
+        for j, dest in enumerate(destinations):
+            key_to_cells.setdefault(distance_cache_key(origin, dest), []).append((i, j))
+    found = {}; min_fetched_at = time.time() - ttl_seconds; keys = list(key_to_cells.keys())
+    try:
+        with conn:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+                batch = keys[start:start + SQLITE_MAX_PARAMETERS]; placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT pair_key, distance_m FROM distance_cache WHERE fetched_at >= ? AND pair_key IN ({placeholders})", [min_fetched_at, *batch]).fetchall()
+                for pair_key, distance_m in rows:
+                    for cell in key_to_cells[pair_key]: found[cell] = int(distance_m)
+    except sqlite3.Error as e:
+        logger.warning(f"Distance cache read failed: {e}"); return {}
+    finally:
+        conn.close()
+    logger.info(f"Distance cache hit {len(found)}/{len(origins) * len(destinations)} cells.")
+    return found
+
+def distance_cache_put(entries: List[tuple], cache_path: str = DISTANCE_CACHE_PATH, ttl_seconds: int = DISTANCE_CACHE_TTL_SECONDS,
+                       max_entries: int = DISTANCE_CACHE_MAX_ENTRIES) -> int:
+    """Stores (origin, destination, meters) entries, skipping failed elements, then evicts; returns entries stored."""
+    rows = [(distance_cache_key(o, d), normalize_address(o), normalize_address(d), int(dist), time.time())
+            for o, d, dist in entries if dist is not None and dist != UNROUTABLE_DISTANCE]
+    if not rows: return 0
+    conn = open_distance_cache(cache_path)
+    if conn is None: return 0
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO distance_cache (pair_key, origin, destination, distance_m, fetched_at) VALUES (?, ?, ?, ?, ?)", rows)
+        distance_cache_evict(conn, ttl_seconds, max_entries)
+        return len(rows)
+    except sqlite3.Error as e:
+        logger.warning(f"Distance cache write failed: {e}"); return 0
+    finally:
+        conn.close()
+
+def distance_cache_evict(conn: sqlite3.Connection, ttl_seconds: int = DISTANCE_CACHE_TTL_SECONDS, max_entries: int = DISTANCE_CACHE_MAX_ENTRIES) -> int:
+    """Drops expired entries, then the oldest ones beyond max_entries; returns entries removed."""
+    with conn:
+        removed = conn.execute("DELETE FROM distance_cache WHERE fetched_at < ?", (time.time() - ttl_seconds,)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM distance_cache").fetchone()[0] - max_entries
+        if overflow > 0:
+            removed += conn.execute("DELETE FROM distance_cache WHERE pair_key IN (SELECT pair_key FROM distance_cache ORDER BY fetched_at ASC LIMIT ?)", (overflow,)).rowcount
+    if removed: logger.info(f"Evicted {removed} distance cache entries.")
+    return removed
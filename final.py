@@ -38,7 +38,9 @@ from vertexai.generative_models import Content, FunctionDeclaration, GenerativeM
 import vertexai.preview.generative_models as generative_models
 from google.cloud import aiplatform
 import sys
-import subprocess
+from gcs_sync import SyncWorker, open_source
+from distance_cache import distance_cache_get, distance_cache_put
+from route_store import route_loc_id, write_routes
 
 # --- Configuration ---
 PROJECT_ID = "gebu-data-ml-day0-01-333910"
@@ -53,19 +55,18 @@ REPLENISH_AGENT_MODEL_ID = "gemini-2.0-flash"
 TEAM_ROUTER_MODEL_ID = "gemini-2.0-flash"
 BQ_LOCATIONS_TABLE_ID = f"{PROJECT_ID}.{BQ_DATASET_ID}.locations"
 BQ_ROUTES_TABLE_ID = f"{PROJECT_ID}.{BQ_DATASET_ID}.routes"
+BQ_ROUTE_SUMMARY_TABLE_ID = f"{PROJECT_ID}.{BQ_DATASET_ID}.route_summary" # Created and backfilled by int.py; refreshed by every route write
 BQ_FORECAST_TABLE_ID = f"{PROJECT_ID}.{BQ_FORECAST_DATASET_ID}.forecast1"
 BQ_PRODUCTS_TABLE_ID = f"{PROJECT_ID}.{BQ_DATASET_ID}.product_inventory"
 REPLENISH_TABLE_ID = f"{PROJECT_ID}.{BQ_DATASET_ID}.product_inventory"
 
-cmd = f"gsutil cp gs://sales_forecast_hackathon/Order_Management.xlsx Order_management.xlsx"
-subprocess.run(cmd, shell=True)
- 
-cmd = f"gsutil cp gs://sales_forecast_hackathon/Historical_Product_Demand.csv Historical_Product_Demand.csv"
-subprocess.run(cmd, shell=True)
- 
-# File paths
+# File paths (kept in sync with GCS_SYNC_SOURCE by a background worker, see start_gcs_sync)
 ORDER_EXCEL_PATH = r"Order_Management.xlsx"
 HISTORY_CSV_PATH = r"Historical_Product_Demand.csv"
+GCS_SYNC_SOURCE = os.environ.get("GCS_SYNC_SOURCE", "gs://sales_forecast_hackathon") # Or a local directory standing in for the bucket
+GCS_SYNC_OBJECTS = {"Order_Management.xlsx": ORDER_EXCEL_PATH, "Historical_Product_Demand.csv": HISTORY_CSV_PATH}
+GCS_SYNC_INTERVAL_SECONDS = int(os.environ.get("GCS_SYNC_INTERVAL_SECONDS", "300"))
+GCS_SYNC_INITIAL_WAIT_SECONDS = 60 # Only when a local copy does not exist yet (first start)
 
 
 
@@ -420,10 +421,34 @@ def load_csv(file_path, data_label="Data"):
         st.error(f"An error occurred while reading {data_label} CSV file ({os.path.basename(file_path)}): {e}", icon="❌")
         return None
 
-@st.cache_data
-def load_historical_demand_data():
+@st.cache_data(max_entries=1)
+def load_historical_demand_data(source_mtime=None):
+    # source_mtime only keys the cache, so a file replaced by the sync worker is reloaded; max_entries=1 drops the old copy
     return load_csv(HISTORY_CSV_PATH, "Historical Demand")
 
+@st.cache_resource(show_spinner=False)
+def start_gcs_sync():
+    # One worker per process; reruns reuse it, so GCS is never touched on the request path.
+    # Failures raise: st.cache_resource does not cache exceptions, so the next rerun retries.
+    worker = SyncWorker(open_source(GCS_SYNC_SOURCE), GCS_SYNC_OBJECTS, GCS_SYNC_INTERVAL_SECONDS).start()
+    if not all(os.path.exists(path) for path in GCS_SYNC_OBJECTS.values()):
+        worker.wait_for_first_pass(GCS_SYNC_INITIAL_WAIT_SECONDS)
+    return worker
+
+def build_product_cube(df, order_by):
+    # Rows sorted by product plus a {product: (start, stop)} index, so per-product views slice instead of scanning
+    if 'Product_Code' not in df.columns:
+        return {"data": df.iloc[0:0], "products": [], "positions": {}}
+    data = df.dropna(subset=['Product_Code']).sort_values(['Product_Code'] + order_by, kind='stable', ignore_index=True)
+    codes = data['Product_Code'].astype(str).to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    positions = {codes[start]: (int(start), int(stop)) for start, stop in zip(starts, np.r_[starts[1:], len(codes)])}
+    return {"data": data, "products": list(positions), "positions": positions}
+
+def cube_slice(cube, product):
+    start, stop = cube["positions"].get(str(product), (0, 0))
+    return cube["data"].iloc[start:stop]
+
 @st.cache_data(ttl=1800)
 def load_bigquery_inventory(_client):
     if not _client:
@@ -623,11 +648,15 @@ def get_osrm_route(points_df):
         return None
 
 # --- Helper Functions from chatbot.py ---
-def create_distance_matrix(addresses: List[str], api_key: str) -> Optional[List[List[int]]]:
+def create_distance_matrix(addresses: List[str], api_key: str, use_cache: bool = True) -> Optional[List[List[int]]]:
     logger.info(f"Fetching distance matrix for {len(addresses)} addresses.")
     try:
         max_elements = 100; num_addresses = len(addresses)
         if num_addresses == 0: logger.error("No addresses."); return None
+        cached = distance_cache_get(addresses, addresses) if use_cache else {}
+        if len(cached) == num_addresses * num_addresses:
+            logger.info("Distance matrix fully served from cache; no API requests sent.")
+            return [[cached[(i, j)] for j in range(num_addresses)] for i in range(num_addresses)]
         max_rows = max_elements // num_addresses if num_addresses > 0 else max_elements
         if max_rows == 0: max_rows = 1
         q, r = divmod(num_addresses, max_rows); distance_matrix = []
@@ -649,6 +678,7 @@ def create_distance_matrix(addresses: List[str], api_key: str) -> Optional[List[
         if not distance_matrix or len(distance_matrix) != num_addresses or not all(len(row) == num_addresses for row in distance_matrix):
             logger.error(f"Final matrix invalid shape. Got {len(distance_matrix)}x{[len(r) for r in distance_matrix if r]}")
             return None
+        if use_cache: distance_cache_put([(addresses[i], addresses[j], dist) for i, row in enumerate(distance_matrix) for j, dist in enumerate(row)])
         return distance_matrix
     except Exception as e: logger.error(f"Error creating distance matrix: {e}", exc_info=True); return None
 
@@ -688,11 +718,11 @@ def format_solution(data: Dict, manager: pywrapcp.RoutingIndexManager, routing:
             idx = routing.Start(v_id); rider = f"Rider{v_id + 1}"; seq = 1
             while not routing.IsEnd(idx):
                 node_idx = manager.IndexToNode(idx); rec_id = f"ROUTE_REC_{week_no}_{rider}_{seq}"
-                routes_data.append({"RouteRecordID": rec_id, "WeekNo": week_no, "RiderID": rider, "Seq": seq, "LocID": node_idx})
+                routes_data.append({"RouteRecordID": rec_id, "WeekNo": week_no, "RiderID": rider, "Seq": seq, "LocID": route_loc_id(node_idx)})
                 idx = solution.Value(routing.NextVar(idx)); seq += 1
                 if routing.IsEnd(idx):
                     end_node = manager.IndexToNode(idx); end_rec_id = f"ROUTE_REC_{week_no}_{rider}_{seq}"
-                    routes_data.append({"RouteRecordID": end_rec_id, "WeekNo": week_no, "RiderID": rider, "Seq": seq, "LocID": end_node})
+                    routes_data.append({"RouteRecordID": end_rec_id, "WeekNo": week_no, "RiderID": rider, "Seq": seq, "LocID": route_loc_id(end_node)})
             end_node_idx = routing.End(v_id); route_dist = solution.Value(dist_dim.CumulVar(end_node_idx))
             logger.info(f"Formatted route {rider}: Seq {seq}, Dist {route_dist}m"); total_dist += route_dist
         logger.info(f"Total dist: {total_dist}m"); return routes_data
@@ -700,7 +730,7 @@ def format_solution(data: Dict, manager: pywrapcp.RoutingIndexManager, routing:
 
 def generate_routes_tool_internal(num_vehicles: int, week_no: int) -> Dict[str, Any]:
     logger.info(f"Generating routes Week {week_no}, {num_vehicles} vehicles.")
-    result = {"status": "error", "message": "Route generation failed.", "routes_data": None, "objective_value": None, "max_route_distance": None}
+    result = {"status": "error", "message": "Route generation failed.", "routes_data": None, "route_summaries": None, "objective_value": None, "max_route_distance": None}
     if not isinstance(num_vehicles, int) or num_vehicles <= 0: result["message"] = "Num vehicles invalid."; return result
     if not isinstance(week_no, int) or week_no <= 0: result["message"] = "Week number invalid."; return result
     if not GOOGLE_MAPS_API_KEY or "YOUR_GOOGLE_MAPS_API_KEY" in GOOGLE_MAPS_API_KEY: result["message"] = "Maps API key not set."; return result
@@ -725,32 +755,21 @@ def generate_routes_tool_internal(num_vehicles: int, week_no: int) -> Dict[str,
         if not formatted_routes: result["message"] = "Failed to format solution."; return result
         result["status"] = "success"; result["message"] = f"Generated routes Week {week_no}, {num_vehicles} vehicles."
         result["routes_data"] = formatted_routes; result["objective_value"] = solution.ObjectiveValue()
-        max_dist = 0
+        max_dist = 0; route_summaries = []
         for v_id in range(num_vehicles):
             if routing.IsVehicleUsed(solution, v_id):
                 try: end_idx = routing.End(v_id); r_dist = solution.Value(dist_dim.CumulVar(end_idx)); max_dist = max(r_dist, max_dist)
-                except Exception as e: logger.warning(f"No cumul dist for {v_id}: {e}")
-        result["max_route_distance"] = max_dist; logger.info(f"Obj: {result['objective_value']}, MaxDist: {max_dist}m")
+                except Exception as e: logger.warning(f"No cumul dist for {v_id}: {e}"); continue
+                route_summaries.append({"WeekNo": week_no, "RiderID": f"Rider{v_id + 1}", "TotalDistance": r_dist})
+        result["max_route_distance"] = max_dist; result["route_summaries"] = route_summaries; logger.info(f"Obj: {result['objective_value']}, MaxDist: {max_dist}m")
     else:
         stat_map = {pywrapcp.ROUTING_NOT_SOLVED:"NOT_SOLVED",pywrapcp.ROUTING_FAIL:"FAIL", pywrapcp.ROUTING_FAIL_TIMEOUT:"TIMEOUT", pywrapcp.ROUTING_INVALID:"INVALID"}; solver_stat = routing.status()
         stat_str = stat_map.get(solver_stat, f"UNKNOWN_{solver_stat}"); result["message"] = f"OR-Tools no solution. Status: {stat_str}."; logger.warning(result["message"])
     return result
 
-def insert_routes_to_bigquery_tool_internal(routes_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    table_id = BQ_ROUTES_TABLE_ID
-    logger.info(f"Attempting BQ insert: {len(routes_data)} rows into {table_id}")
-    result = {"status": "error", "message": "BQ insert failed.", "rows_inserted": 0, "errors": None}
-    if not isinstance(routes_data, list): result["message"] = "Invalid input type."; return result
-    if not routes_data: result["message"] = "No data to insert."; result["status"] = "success"; return result
-    if not table_id or "your-gcp-project" in table_id: result["message"] = "Routes BQ table ID not set."; return result
-    try:
-        client = get_bq_client()
-        if client:
-            errors = client.insert_rows_json(table_id, routes_data, skip_invalid_rows=False)
-            if not errors: result["status"] = "success"; result["message"] = f"Inserted {len(routes_data)} rows into {table_id}."; result["rows_inserted"] = len(routes_data)
-            else: result["message"] = "Errors during BQ insert."; result["errors"] = errors; logger.error(f"BQ Insert Errors: {[f'Row {e['index']}: {e['errors']}' for e in errors]}")
-    except Exception as e: result["message"] = f"BQ insertion error: {e}"; logger.error(result["message"], exc_info=True); result["errors"]=[str(e)]
-    return result
+def insert_routes_to_bigquery_tool_internal(routes_data: List[Dict[str, Any]], route_summaries: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    # Same Parquet load + MERGE writer as int.py: a streaming insert here would block int.py's MERGE on the week
+    return write_routes(get_bq_client(), BQ_ROUTES_TABLE_ID, routes_data, route_summaries, BQ_ROUTE_SUMMARY_TABLE_ID)
 
 def update_quantity_in_bigquery(project_id: str, dataset_id: str, table_name: str) -> Dict[str, Union[str, int, None]]:
     full_table_id = f"{project_id}.{dataset_id}.{table_name}"
@@ -902,7 +921,7 @@ def generate_routes_wrapper(num_vehicles: int, week_no: int) -> Union[str, List[
     generated_routes = gen_result["routes_data"]
     logger.info(f"Generated {len(generated_routes)} route steps successfully.")
     logger.info("Attempting auto-insert of generated routes to BigQuery...")
-    insert_result = insert_routes_to_bigquery_tool_internal(routes_data=generated_routes)
+    insert_result = insert_routes_to_bigquery_tool_internal(routes_data=generated_routes, route_summaries=gen_result.get("route_summaries"))
     if insert_result.get("status") != "success":
         insert_error_msg = insert_result.get("message", "Saving to BQ failed."); logger.error(f"Insert failed after gen: {insert_error_msg}")
         return f"Warning: Routes generated ({len(generated_routes)} steps), but failed to save to BigQuery: {insert_error_msg}. Data: {generated_routes}"
@@ -1078,6 +1097,11 @@ async def get_team_response(team: Team, query: str) -> str:
 # --- Streamlit App Configuration ---
 st.set_page_config(page_title="Supply Chain Operations Hub", page_icon="🚚", layout="wide")
 st.markdown(APP_STYLE, unsafe_allow_html=True)
+try:
+    gcs_sync_worker = start_gcs_sync()
+except Exception as e:
+    logger.error(f"Could not start GCS sync from {GCS_SYNC_SOURCE}: {e}")
+    gcs_sync_worker = None # Serve the existing local copies; retried on the next rerun
 
 # --- Sidebar Selector ---
 selected_section = st.sidebar.selectbox("Select Section", ["Dashboard", "Chatbot"])
@@ -1090,7 +1114,7 @@ if selected_section == "Dashboard":
     with st.spinner("Loading inventory data from BigQuery..."):
         df_inventory_bq_raw = load_bigquery_inventory(bq_client)
     with st.spinner("Loading historical demand data from CSV..."):
-        df_history_demand = load_historical_demand_data()
+        df_history_demand = load_historical_demand_data(os.path.getmtime(HISTORY_CSV_PATH) if os.path.exists(HISTORY_CSV_PATH) else None)
     with st.spinner("Loading forecast data from BigQuery..."):
         df_forecast_demand = load_bigquery_forecast(bq_client)
     with st.spinner("Processing inventory data..."):
@@ -1224,23 +1248,27 @@ if selected_section == "Dashboard":
             df = client.query(query).to_dataframe()
             df['date'] = pd.to_datetime(df['date'])
             return df
+
+        @st.cache_resource(ttl=3600)  # Built once per data refresh; shared, not copied, on every rerun
+        def load_forecast_cube():
+            return build_product_cube(load_forecast_data(), ['date'])
         g_PROJECT_ID = "gebu-data-ml-day0-01-333910"
         g_DATASET_ID = "supply_chain"
         g_TABLE_ID = "forecast1"
         # --- Main Streamlit Application ---
         st.title("Product Forecast Visualization")
 
-        # Load the data
-        forecast_df = load_forecast_data()
+        # Load the data, indexed by product
+        forecast_cube = load_forecast_cube()
 
         # Get unique product codes for the dropdown
-        product_codes = forecast_df['Product_Code'].unique()
+        product_codes = forecast_cube["products"]
 
         # Create the product selection dropdown
         selected_product = st.selectbox("Select a Product:", product_codes)
 
-        # Filter data for the selected product
-        filtered_df = forecast_df[forecast_df['Product_Code'] == selected_product].copy()
+        # Slice the selected product's rows from the cube (no full-table scan)
+        filtered_df = cube_slice(forecast_cube, selected_product).copy()
 
         if not filtered_df.empty:
             # Find the latest date in the filtered data
@@ -0,0 +1,160 @@
+# =============================================================================
+# Background GCS -> local file sync (used by final.py)
+# =============================================================================
+# A daemon thread polls object versions (GCS generation, or mtime/size for a local
+# directory standing in for the bucket) and downloads only objects that changed, into a
+# temp file that then atomically replaces the local copy. No Streamlit dependency, so it
+# can be exercised against a plain directory.
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+try:
+    from google.cloud import storage
+    GCS_AVAILABLE = True
+except ImportError:
+    GCS_AVAILABLE = False
+
+logger = logging.getLogger("IntegratedApp")
+
+# --- Sync Config ---
+SYNC_INTERVAL_SECONDS = 300 # How often the worker checks object versions
+SYNC_STATE_FILENAME = ".gcs_sync.json" # Next to the local files: {local path: version synced}; survives restarts
+
+
+class GCSSource:
+    """Objects in a GCS bucket, versioned by generation."""
+
+    def __init__(self, bucket_name: str, client=None):
+        if not GCS_AVAILABLE: raise ImportError("google-cloud-storage is required to sync from gs:// URIs.")
+        self.bucket = (client or storage.Client()).bucket(bucket_name)
+        self.uri = f"gs://{bucket_name}"
+
+    def version(self, name: str) -> Optional[str]:
+        """Returns the object's generation (metadata request only), or None if it does not exist."""
+        blob = self.bucket.get_blob(name)
+        return str(blob.generation) if blob is not None else None
+
+    def download(self, name: str, version: str, dest_path: str):
+        """Downloads exactly the generation that was checked, so version and content cannot disagree."""
+        self.bucket.blob(name, generation=int(version)).download_to_filename(dest_path)
+
+
+class LocalDirSource:
+    """Files in a local directory standing in for a bucket (tests, offline runs), versioned by mtime and size."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.uri = root
+
+    def version(self, name: str) -> Optional[str]:
+        try: stat = os.stat(os.path.join(self.root, name))
+        except FileNotFoundError: return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def download(self, name: str, version: str, dest_path: str):
+        shutil.copyfile(os.path.join(self.root, name), dest_path)
+
+
+def open_source(uri: str, client=None):
+    """Returns the source for a "gs://bucket" URI or a local directory path."""
+    if uri.startswith("gs://"): return GCSSource(uri[len("gs://"):].strip("/"), client)
+    return LocalDirSource(uri)
+
+
+def read_sync_state(state_path: str) -> Dict[str, str]:
+    try:
+        with open(state_path, encoding="utf-8") as f: return json.load(f)
+    except FileNotFoundError: return {}
+    except Exception as e: logger.warning(f"GCS sync: Ignoring unreadable state file {state_path}: {e}"); return {}
+
+
+def write_sync_state(state_path: str, state: Dict[str, str]):
+    tmp_path = f"{state_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f: json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def sync_object(source, name: str, local_path: str, synced_version: Optional[str]) -> Dict[str, Any]:
+    """Downloads name to local_path if its version differs from synced_version (or the local file is missing).
+
+    The download goes to a temp file in the destination directory and replaces local_path in one step, so
+    readers see either the old file or the new one, never a partial download. Returns
+    {"status": "downloaded"|"unchanged"|"missing"|"error", "version", "message"}.
+    """
+    try:
+        version = source.version(name)
+        if version is None: return {"status": "missing", "version": None, "message": f"{source.uri}/{name} does not exist."}
+        if version == synced_version and os.path.exists(local_path): return {"status": "unchanged", "version": version, "message": ""}
+        directory = os.path.dirname(os.path.abspath(local_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{os.path.basename(local_path)}.{uuid.uuid4().hex}.tmp")
+        try:
+            source.download(name, version, tmp_path)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+        logger.info(f"GCS sync: Downloaded {source.uri}/{name} (version {version}) to {local_path}")
+        return {"status": "downloaded", "version": version, "message": ""}
+    except Exception as e:
+        logger.error(f"GCS sync: Failed to sync {source.uri}/{name}: {e}")
+        return {"status": "error", "version": synced_version, "message": str(e)}
+
+
+class SyncWorker:
+    """Keeps local copies of bucket objects current from a daemon thread.
+
+    objects maps object names to local paths. Synced versions are persisted in SYNC_STATE_FILENAME next to
+    each local file, so a restart does not re-download unchanged objects.
+    """
+
+    def __init__(self, source, objects: Dict[str, str], interval: float = SYNC_INTERVAL_SECONDS):
+        self.source, self.objects, self.interval = source, dict(objects), interval
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+        self.first_pass_done = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def state_path(self, local_path: str) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(local_path)), SYNC_STATE_FILENAME)
+
+    def sync_once(self) -> Dict[str, Dict[str, Any]]:
+        """Checks every object once and downloads the changed ones; returns {object name: sync_object result}."""
+        with self._lock:
+            results = {}
+            for name, local_path in self.objects.items():
+                state_path = self.state_path(local_path); state = read_sync_state(state_path); key = os.path.abspath(local_path)
+                results[name] = result = sync_object(self.source, name, local_path, state.get(key))
+                if result["status"] == "downloaded":
+                    state = read_sync_state(state_path); state[key] = result["version"] # Re-read: files may share a state file
+                    try: write_sync_state(state_path, state)
+                    except OSError as e: logger.warning(f"GCS sync: Could not record synced version: {e}")
+            self.last_results = results
+            self.first_pass_done.set()
+            return results
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sync_once()
+            self._stop.wait(self.interval)
+
+    def start(self) -> "SyncWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gcs-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def wait_for_first_pass(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the first sync pass finished (only worth doing when a local file does not exist yet)."""
+        return self.first_pass_done.wait(timeout)
@@ -0,0 +1,155 @@
+# =============================================================================
+# BigQuery Route Writer (shared by int.py and final.py)
+# =============================================================================
+# Route steps are written as one Parquet load job into a throwaway staging table and
+# MERGEd into the routes table on RouteRecordID, never streamed: streaming inserts sit
+# in a buffer that blocks later DML on the table, so every writer of `routes` must
+# come through here. No Streamlit dependency; the client and table IDs are passed in.
+import io
+import logging
+import uuid
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+try:
+    from google.cloud import bigquery
+    from google.api_core.exceptions import NotFound, Forbidden
+    BIGQUERY_AVAILABLE = True
+except ImportError:
+    BIGQUERY_AVAILABLE = False
+
+logger = logging.getLogger("IntegratedApp")
+
+# --- Route Table Config ---
+ROUTES_TABLE_COLUMNS = ["RouteRecordID", "WeekNo", "RiderID", "Seq", "LocID"]
+ROUTE_LOC_ID_PREFIX = "LOC" # Node i of BASE_ADDRESSES is LocID f"LOC{i}" in the locations table (LOC0 = DC)
+ROUTES_STAGING_SUFFIX = "_staging" # Per-write staging tables: routes_staging_<id>, dropped after the MERGE
+BQ_SQL_TYPES = {"INTEGER": "INT64", "INT64": "INT64", "FLOAT": "FLOAT64", "FLOAT64": "FLOAT64", "NUMERIC": "NUMERIC", "BIGNUMERIC": "BIGNUMERIC",
+                "STRING": "STRING", "BOOLEAN": "BOOL", "BOOL": "BOOL", "DATE": "DATE", "DATETIME": "DATETIME", "TIMESTAMP": "TIMESTAMP"} # Schema field types -> SQL types
+
+
+def route_loc_id(node: int) -> str:
+    """LocID of route node `node` in the locations table."""
+    return f"{ROUTE_LOC_ID_PREFIX}{int(node)}"
+
+def format_route_records(routes: List[List[int]], week_no: int) -> List[Dict[str, Any]]:
+    """Turns per-vehicle node sequences (depot to depot) into route records; unused (empty) vehicles get none."""
+    records = []
+    for vehicle_id, nodes in enumerate(routes):
+        rider_id = f"Rider{vehicle_id + 1}"
+        for seq, node in enumerate(nodes, start=1):
+            records.append({"RouteRecordID": f"ROUTE_REC_{week_no}_{rider_id}_{seq}", "WeekNo": week_no, "RiderID": rider_id, "Seq": seq,
+                            "LocID": route_loc_id(node)})
+    return records
+
+def routes_to_parquet(routes_data: List[Dict[str, Any]], route_summaries: Optional[List[Dict[str, Any]]] = None) -> tuple:
+    """Serializes route records to an in-memory Parquet file, last record winning per RouteRecordID.
+
+    Each row also carries its rider's StopCount/TotalDistance for the route summary MERGE (TotalDistance is
+    null without route_summaries). Returns (buffer, num_rows, week_nos) so the MERGEs can be scoped to the weeks written.
+    """
+    df = pd.DataFrame(routes_data, columns=ROUTES_TABLE_COLUMNS).drop_duplicates(subset=['RouteRecordID'], keep='last')
+    df['StopCount'] = (df.groupby(['WeekNo', 'RiderID'])['RouteRecordID'].transform('size') - 2).clip(lower=0).astype('int64')
+    distances = pd.DataFrame(route_summaries or [], columns=['WeekNo', 'RiderID', 'TotalDistance'])
+    df = df.merge(distances.drop_duplicates(subset=['WeekNo', 'RiderID'], keep='last'), on=['WeekNo', 'RiderID'], how='left')
+    df['TotalDistance'] = df['TotalDistance'].astype('Int64')
+    buffer = io.BytesIO(); df.to_parquet(buffer, index=False); buffer.seek(0)
+    week_nos = sorted(int(w) for w in pd.to_numeric(df['WeekNo'], errors='coerce').dropna().unique())
+    return buffer, len(df), week_nos
+
+def merge_routes_sql(routes_table_id: str, staging_table_id: str, target_schema: list) -> str:
+    """Builds the upsert of a staged route load into routes_table_id, casting to the target's column types.
+
+    Rows are keyed on RouteRecordID; rows of the written weeks that are not in the load (seqs past the new
+    route end, riders no longer used) are deleted, so a regenerated week holds exactly the new plan.
+    """
+    target_types = {field.name: field.field_type for field in target_schema}
+    cast = lambda col: f"CAST(S.{col} AS {BQ_SQL_TYPES.get(target_types.get(col), 'STRING')})"
+    updates = ", ".join(f"{col} = {cast(col)}" for col in ROUTES_TABLE_COLUMNS if col != "RouteRecordID")
+    return f"""
+        MERGE `{routes_table_id}` T
+        USING `{staging_table_id}` S
+        ON T.RouteRecordID = S.RouteRecordID AND T.WeekNo IN UNNEST(@week_nos)
+        WHEN MATCHED THEN UPDATE SET {updates}
+        WHEN NOT MATCHED THEN INSERT ({", ".join(ROUTES_TABLE_COLUMNS)}) VALUES ({", ".join(cast(col) for col in ROUTES_TABLE_COLUMNS)})
+        WHEN NOT MATCHED BY SOURCE AND T.WeekNo IN UNNEST(@week_nos) THEN DELETE
+    """
+
+def merge_route_summary_sql(summary_table_id: str, staging_table_id: str) -> str:
+    """Builds the MERGE that refreshes summary_table_id for the weeks in a staged route load."""
+    return f"""
+        MERGE `{summary_table_id}` T
+        USING (SELECT CAST(WeekNo AS INT64) AS WeekNo, CAST(RiderID AS STRING) AS RiderID, CAST(ANY_VALUE(StopCount) AS INT64) AS StopCount,
+                      CAST(ANY_VALUE(TotalDistance) AS INT64) AS TotalDistance
+               FROM `{staging_table_id}` GROUP BY 1, 2) S
+        ON T.WeekNo = S.WeekNo AND T.RiderID = S.RiderID
+        WHEN MATCHED THEN UPDATE SET StopCount = S.StopCount, TotalDistance = S.TotalDistance, UpdatedAt = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (WeekNo, RiderID, StopCount, TotalDistance, UpdatedAt) VALUES (S.WeekNo, S.RiderID, S.StopCount, S.TotalDistance, CURRENT_TIMESTAMP())
+        WHEN NOT MATCHED BY SOURCE AND T.WeekNo IN UNNEST(@week_nos) THEN DELETE
+    """
+
+def dedupe_routes_weeks(client, routes_table_id: str, week_nos: List[int]) -> int:
+    """Collapses duplicate RouteRecordID rows left by the old append-only writers in the given weeks.
+
+    Only called after an upsert, when every copy of a record already holds the same values. Returns rows removed.
+    """
+    query = f"""
+        MERGE `{routes_table_id}` T
+        USING (SELECT row.* FROM (SELECT ANY_VALUE(r) AS row FROM `{routes_table_id}` r WHERE r.WeekNo IN UNNEST(@week_nos) GROUP BY r.RouteRecordID)) S
+        ON FALSE
+        WHEN NOT MATCHED BY SOURCE AND T.WeekNo IN UNNEST(@week_nos) THEN DELETE
+        WHEN NOT MATCHED THEN INSERT ROW
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("week_nos", "INT64", week_nos)])
+    job = client.query(query, job_config=job_config); job.result()
+    dml_stats = getattr(job, "dml_stats", None)
+    removed = (dml_stats.deleted_row_count - dml_stats.inserted_row_count) if dml_stats else 0
+    logger.info(f"Removed {removed} duplicate route rows in weeks {week_nos}.")
+    return removed
+
+def write_routes(client, routes_table_id: str, routes_data: List[Dict[str, Any]], route_summaries: Optional[List[Dict[str, Any]]] = None,
+                 summary_table_id: Optional[str] = None) -> Dict[str, Any]:
+    """Writes route records into routes_table_id with one Parquet load job and a MERGE on RouteRecordID.
+
+    The written weeks' previous plan is replaced, so re-running a week never leaves duplicate or stale steps.
+    With summary_table_id, the same staged load then refreshes the route summary table (route_summaries
+    supply rider distances).
+    """
+    logger.info(f"Writing {len(routes_data) if isinstance(routes_data, list) else 0} routes into {routes_table_id}")
+    result = {"status": "error", "message": "BQ write failed.", "rows_inserted": 0, "rows_updated": 0, "rows_deleted": 0, "errors": None}
+    if not isinstance(routes_data, list): result["message"] = "Invalid input: routes_data must be list."; return result
+    if not routes_data: result["message"] = "No route data to insert."; result["status"] = "success"; return result
+    if not routes_table_id or "your-gcp-project" in routes_table_id: result["message"] = "Routes BQ table ID not configured."; return result
+    if not BIGQUERY_AVAILABLE: result["message"] = "google-cloud-bigquery is not installed."; return result
+    if client is None: result["message"] = "BQ client unavailable."; return result
+    staging_table_id = f"{routes_table_id}{ROUTES_STAGING_SUFFIX}_{uuid.uuid4().hex[:12]}"
+    try:
+        buffer, num_rows, week_nos = routes_to_parquet(routes_data, route_summaries)
+        target_schema = client.get_table(routes_table_id).schema
+        load_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET, write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+        client.load_table_from_file(buffer, staging_table_id, job_config=load_config).result()
+        merge_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("week_nos", "INT64", week_nos)])
+        merge_job = client.query(merge_routes_sql(routes_table_id, staging_table_id, target_schema), job_config=merge_config); merge_job.result()
+        dml_stats = getattr(merge_job, "dml_stats", None)
+        if dml_stats:
+            result["rows_inserted"] = dml_stats.inserted_row_count; result["rows_updated"] = dml_stats.updated_row_count
+            result["rows_deleted"] = dml_stats.deleted_row_count
+            # More rows touched than loaded means some IDs matched several stored copies (legacy appends)
+            if dml_stats.inserted_row_count + dml_stats.updated_row_count > num_rows: result["rows_deleted"] += dedupe_routes_weeks(client, routes_table_id, week_nos)
+        else: result["rows_inserted"] = merge_job.num_dml_affected_rows or 0
+        summary_note = ""
+        if summary_table_id:
+            try: client.query(merge_route_summary_sql(summary_table_id, staging_table_id), job_config=merge_config).result()
+            except Exception as e: logger.error(f"Route summary refresh failed: {e}", exc_info=True); summary_note = " Route summary not refreshed."
+        result["status"] = "success"
+        result["message"] = (f"Wrote {num_rows} route steps into {routes_table_id} ({result['rows_inserted']} new, {result['rows_updated']} updated, "
+                             f"{result['rows_deleted']} stale removed).{summary_note}")
+        logger.info(result["message"])
+    except Forbidden as e: result["message"] = f"Permission denied writing into {routes_table_id}."; logger.error(result["message"], exc_info=True); result["errors"]=[str(e)]
+    except NotFound as e: result["message"] = f"BQ table {routes_table_id} not found."; logger.error(result["message"], exc_info=True); result["errors"]=[str(e)]
+    except Exception as e: result["message"] = f"Unexpected BQ write error: {e}"; logger.error(result["message"], exc_info=True); result["errors"]=[str(e)]
+    finally:
+        try: client.delete_table(staging_table_id, not_found_ok=True)
+        except Exception as e: logger.warning(f"Could not drop staging table {staging_table_id}: {e}")
+    return result
@@ -0,0 +1,68 @@
+import sqlite3
+
+import distance_cache
+from distance_cache import UNROUTABLE_DISTANCE, distance_cache_get, distance_cache_key, distance_cache_put, normalize_address
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def cache_file(tmp_path):
+    return str(tmp_path / "distances.sqlite3")
+
+def stored_keys(path):
+    with sqlite3.connect(path) as conn: return {row[0] for row in conn.execute("SELECT pair_key FROM distance_cache")}
+
+
+def test_equivalent_spellings_share_a_key():
+    assert normalize_address("1005+Tillman+St+Memphis+TN") == normalize_address("1005 Tillman St,  memphis, TN")
+    assert distance_cache_key("A+St", "B+St") == distance_cache_key("a st", "b st")
+    assert distance_cache_key("A+St", "B+St") != distance_cache_key("B+St", "A+St") # Directed pairs
+
+
+def test_hits_only_cover_stored_pairs(tmp_path):
+    path = cache_file(tmp_path)
+    assert distance_cache_put([("A", "B", 120), ("B", "A", 130)], cache_path=path) == 2
+    found = distance_cache_get(["a", "B"], ["a", "b"], cache_path=path)
+    assert found == {(0, 1): 120, (1, 0): 130} # (A, A) and (B, B) were never fetched
+
+def test_failed_elements_are_not_stored(tmp_path):
+    path = cache_file(tmp_path)
+    assert distance_cache_put([("A", "B", UNROUTABLE_DISTANCE), ("B", "A", None)], cache_path=path) == 0
+    assert distance_cache_get(["A", "B"], ["A", "B"], cache_path=path) == {}
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    path = cache_file(tmp_path); clock = FakeClock()
+    monkeypatch.setattr(distance_cache, "time", clock)
+    distance_cache_put([("A", "B", 120)], cache_path=path)
+    clock.now += 50
+    assert distance_cache_get(["A"], ["B"], ttl_seconds=100, cache_path=path) == {(0, 0): 120}
+    clock.now += 100
+    assert distance_cache_get(["A"], ["B"], ttl_seconds=100, cache_path=path) == {}
+
+def test_put_evicts_expired_entries(tmp_path, monkeypatch):
+    path = cache_file(tmp_path); clock = FakeClock()
+    monkeypatch.setattr(distance_cache, "time", clock)
+    distance_cache_put([("A", "B", 120)], cache_path=path, ttl_seconds=100)
+    clock.now += 200
+    distance_cache_put([("B", "C", 80)], cache_path=path, ttl_seconds=100)
+    assert stored_keys(path) == {distance_cache_key("B", "C")}
+
+def test_put_evicts_oldest_beyond_max_entries(tmp_path, monkeypatch):
+    path = cache_file(tmp_path); clock = FakeClock()
+    monkeypatch.setattr(distance_cache, "time", clock)
+    for i in range(5):
+        distance_cache_put([(f"O{i}", "D", 100 + i)], cache_path=path, max_entries=3); clock.now += 1
+    assert stored_keys(path) == {distance_cache_key(f"O{i}", "D") for i in (2, 3, 4)}
+
+
+def test_unopenable_cache_is_a_miss(tmp_path):
+    path = str(tmp_path / "missing" / "distances.sqlite3")
+    assert distance_cache_put([("A", "B", 120)], cache_path=path) == 0
+    assert distance_cache_get(["A"], ["B"], cache_path=path) == {}
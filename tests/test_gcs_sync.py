@@ -0,0 +1,102 @@
+import json
+import os
+
+import gcs_sync
+from gcs_sync import LocalDirSource, SyncWorker, open_source, sync_object
+
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as f: f.write(content)
+    return path
+
+def read(path):
+    with open(path, encoding="utf-8") as f: return f.read()
+
+def bump_mtime(path):
+    stat = os.stat(path); os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def make_worker(tmp_path, names=("orders.xlsx", "history.csv")):
+    bucket = tmp_path / "bucket"; local = tmp_path / "local"; bucket.mkdir(); local.mkdir()
+    for name in names: write(bucket / name, f"v1 {name}")
+    return bucket, local, SyncWorker(LocalDirSource(str(bucket)), {name: str(local / name) for name in names}, interval=0.05)
+
+
+def test_open_source_local_directory(tmp_path):
+    source = open_source(str(tmp_path))
+    assert isinstance(source, LocalDirSource) and source.uri == str(tmp_path)
+
+
+def test_first_pass_downloads_and_records_versions(tmp_path):
+    bucket, local, worker = make_worker(tmp_path)
+    results = worker.sync_once()
+    assert {name: result["status"] for name, result in results.items()} == {"orders.xlsx": "downloaded", "history.csv": "downloaded"}
+    assert read(local / "history.csv") == "v1 history.csv"
+    state = json.loads(read(local / gcs_sync.SYNC_STATE_FILENAME))
+    assert state[str(local / "orders.xlsx")] == worker.source.version("orders.xlsx")
+    assert worker.first_pass_done.is_set()
+
+
+def test_unchanged_objects_are_not_downloaded_again(tmp_path, monkeypatch):
+    bucket, local, worker = make_worker(tmp_path)
+    worker.sync_once()
+    monkeypatch.setattr(LocalDirSource, "download", lambda *args: (_ for _ in ()).throw(AssertionError("re-downloaded")))
+    assert all(result["status"] == "unchanged" for result in worker.sync_once().values())
+    # A new worker (process restart) reads the persisted state instead of downloading again
+    restarted = SyncWorker(LocalDirSource(str(bucket)), worker.objects)
+    assert all(result["status"] == "unchanged" for result in restarted.sync_once().values())
+
+
+def test_changed_object_replaces_local_copy(tmp_path):
+    bucket, local, worker = make_worker(tmp_path)
+    worker.sync_once()
+    write(bucket / "history.csv", "v2 history.csv, longer"); bump_mtime(bucket / "history.csv")
+    results = worker.sync_once()
+    assert results["history.csv"]["status"] == "downloaded" and results["orders.xlsx"]["status"] == "unchanged"
+    assert read(local / "history.csv") == "v2 history.csv, longer"
+
+
+def test_deleted_local_copy_is_restored(tmp_path):
+    bucket, local, worker = make_worker(tmp_path)
+    worker.sync_once()
+    os.remove(local / "orders.xlsx")
+    assert worker.sync_once()["orders.xlsx"]["status"] == "downloaded"
+    assert read(local / "orders.xlsx") == "v1 orders.xlsx"
+
+
+def test_missing_object_keeps_local_copy(tmp_path):
+    bucket, local, worker = make_worker(tmp_path)
+    worker.sync_once()
+    os.remove(bucket / "orders.xlsx")
+    assert worker.sync_once()["orders.xlsx"]["status"] == "missing"
+    assert read(local / "orders.xlsx") == "v1 orders.xlsx"
+
+
+def test_failed_download_leaves_old_file_and_no_temp_files(tmp_path):
+    bucket, local, worker = make_worker(tmp_path, names=("history.csv",))
+    worker.sync_once()
+    write(bucket / "history.csv", "v2"); bump_mtime(bucket / "history.csv")
+
+    class FailingSource(LocalDirSource):
+        def download(self, name, version, dest_path):
+            write(dest_path, "partial"); raise OSError("connection reset")
+
+    result = sync_object(FailingSource(str(bucket)), "history.csv", str(local / "history.csv"), "stale")
+    assert result["status"] == "error" and result["version"] == "stale" and "connection reset" in result["message"]
+    assert read(local / "history.csv") == "v1 history.csv"
+    assert sorted(os.listdir(local)) == sorted([gcs_sync.SYNC_STATE_FILENAME, "history.csv"])
+
+
+def test_background_thread_picks_up_changes(tmp_path):
+    bucket, local, worker = make_worker(tmp_path, names=("history.csv",))
+    worker.start()
+    try:
+        assert worker.wait_for_first_pass(5)
+        write(bucket / "history.csv", "v2 from thread"); bump_mtime(bucket / "history.csv")
+        for _ in range(100):
+            if read(local / "history.csv") == "v2 from thread": break
+            worker._stop.wait(0.05)
+        assert read(local / "history.csv") == "v2 from thread"
+    finally:
+        worker.stop(timeout=5)
+    assert not worker._thread.is_alive()
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from route_store import (ROUTE_LOC_ID_PREFIX, ROUTES_TABLE_COLUMNS, format_route_records, merge_route_summary_sql, merge_routes_sql,
+                         route_loc_id, routes_to_parquet, write_routes)
+
+
+def record(week, rider, seq, loc):
+    return {"RouteRecordID": f"ROUTE_REC_{week}_{rider}_{seq}", "WeekNo": week, "RiderID": rider, "Seq": seq, "LocID": loc}
+
+def field(name, field_type):
+    return SimpleNamespace(name=name, field_type=field_type)
+
+
+def test_formatted_records_use_the_locations_table_key():
+    records = format_route_records([[0, 3, 7, 0], [], [0, 12, 0]], week_no=5)
+    assert [(r["RiderID"], r["Seq"], r["LocID"]) for r in records] == [
+        ("Rider1", 1, "LOC0"), ("Rider1", 2, "LOC3"), ("Rider1", 3, "LOC7"), ("Rider1", 4, "LOC0"),
+        ("Rider3", 1, "LOC0"), ("Rider3", 2, "LOC12"), ("Rider3", 3, "LOC0")]
+    assert records[0]["RouteRecordID"] == "ROUTE_REC_5_Rider1_1"
+    # The depot is the DC row and the prefix strips back to the node (chatbot_load_previous_routes)
+    assert route_loc_id(0) == "LOC0" and int(records[1]["LocID"].replace(ROUTE_LOC_ID_PREFIX, "")) == 3
+    buffer, _, _ = routes_to_parquet(records)
+    assert pd.read_parquet(buffer)["LocID"].tolist()[:2] == ["LOC0", "LOC3"] # Staged as STRING, matching locations.LocID
+
+
+def test_parquet_keeps_last_record_and_adds_summary_columns():
+    routes = [record(3, "Rider1", 1, "LOC0"), record(3, "Rider1", 2, "LOC4"), record(3, "Rider1", 2, "LOC5"), record(3, "Rider1", 3, "LOC0"),
+              record(4, "Rider2", 1, "LOC0"), record(4, "Rider2", 2, "LOC0")]
+    buffer, num_rows, week_nos = routes_to_parquet(routes, [{"WeekNo": 3, "RiderID": "Rider1", "TotalDistance": 1200}])
+    df = pd.read_parquet(buffer)
+    assert num_rows == 5 and week_nos == [3, 4]
+    assert df.loc[df["RouteRecordID"] == "ROUTE_REC_3_Rider1_2", "LocID"].tolist() == ["LOC5"]
+    by_rider = df.drop_duplicates("RiderID").set_index("RiderID")
+    assert by_rider.loc["Rider1", "StopCount"] == 1 and by_rider.loc["Rider2", "StopCount"] == 0
+    assert by_rider.loc["Rider1", "TotalDistance"] == 1200 and pd.isna(by_rider.loc["Rider2", "TotalDistance"])
+
+
+def test_merge_casts_to_target_types_and_scopes_deletes_to_written_weeks():
+    schema = [field("RouteRecordID", "STRING"), field("WeekNo", "INTEGER"), field("RiderID", "STRING"), field("Seq", "INTEGER"), field("LocID", "STRING")]
+    sql = merge_routes_sql("p.d.routes", "p.d.routes_staging_x", schema)
+    assert "MERGE `p.d.routes` T" in sql and "USING `p.d.routes_staging_x` S" in sql
+    assert "CAST(S.Seq AS INT64)" in sql and "CAST(S.LocID AS STRING)" in sql
+    assert f"INSERT ({', '.join(ROUTES_TABLE_COLUMNS)})" in sql
+    assert "WHEN NOT MATCHED BY SOURCE AND T.WeekNo IN UNNEST(@week_nos) THEN DELETE" in sql
+
+def test_summary_merge_targets_the_given_table():
+    sql = merge_route_summary_sql("p.d.route_summary", "p.d.routes_staging_x")
+    assert "MERGE `p.d.route_summary` T" in sql and "FROM `p.d.routes_staging_x`" in sql
+
+
+def test_write_routes_validates_before_touching_bigquery():
+    assert write_routes(None, "p.d.routes", "not a list")["status"] == "error"
+    assert write_routes(None, "p.d.routes", [])["status"] == "success"
+    assert write_routes(None, "your-gcp-project.d.routes", [record(1, "Rider1", 1, "LOC0")])["message"] == "Routes BQ table ID not configured."
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import vrp_solver
+from vrp_solver import (UNROUTABLE_DISTANCE, cluster_stops, haversine_distance_matrix, solve_many, solve_vrp,
+                        solve_vrp_clustered, subproblem, to_cost_matrix)
+
+requires_ortools = pytest.mark.skipif(not vrp_solver.ORTOOLS_AVAILABLE, reason="OR-Tools not installed")
+
+
+def instance(num_nodes=25, num_vehicles=3, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(40.0, 40.2, num_nodes); lons = rng.uniform(-74.1, -73.9, num_nodes)
+    data = {"distance_matrix": haversine_distance_matrix(lats, lons), "num_vehicles": num_vehicles, "depot": 0}
+    return data, lats, lons
+
+def visited_stops(result):
+    return sorted(node for route in result["routes"] for node in route[1:-1])
+
+
+def test_haversine_matrix_is_symmetric_with_zero_diagonal():
+    matrix = haversine_distance_matrix([40.0, 41.0, 40.5], [-74.0, -74.0, -73.5])
+    assert matrix.dtype == np.int64 and matrix.shape == (3, 3)
+    assert (matrix == matrix.T).all() and (np.diag(matrix) == 0).all()
+
+def test_haversine_applies_road_factor():
+    one_degree = haversine_distance_matrix([0.0, 1.0], [0.0, 0.0], road_factor=1.0)[0, 1]
+    assert one_degree == pytest.approx(111195, rel=1e-3)
+    assert haversine_distance_matrix([0.0, 1.0], [0.0, 0.0], road_factor=1.3)[0, 1] == pytest.approx(one_degree * 1.3, abs=1)
+
+
+def test_to_cost_matrix_validates_shape_and_values():
+    assert to_cost_matrix(None, 2) is None
+    assert to_cost_matrix([[0, 1], [1, 0]], 3) is None
+    assert to_cost_matrix([[0, 1], [1]], 2) is None
+    cost = to_cost_matrix([[0, -5], [7, 0]], 2)
+    assert cost.dtype == np.int64 and cost.flags["C_CONTIGUOUS"]
+    assert cost[0, 1] == UNROUTABLE_DISTANCE and cost[1, 0] == 7
+
+
+@pytest.mark.parametrize("method", vrp_solver.CLUSTER_METHODS)
+def test_cluster_stops_assigns_every_stop_once(method):
+    _, lats, lons = instance(41)
+    labels = cluster_stops(lats, lons, 4, depot=0, method=method)
+    assert labels[0] == -1
+    counts = np.bincount(labels[1:], minlength=4)
+    assert counts.sum() == 40 and (counts > 0).all()
+    assert counts.max() <= np.ceil(40 / 4 * vrp_solver.KMEANS_BALANCE_SLACK)
+
+def test_sweep_clusters_balance_demand():
+    _, lats, lons = instance(41)
+    demands = np.r_[0, np.tile([1, 3], 20)]
+    labels = cluster_stops(lats, lons, 4, demands=demands)
+    loads = np.bincount(labels[1:], weights=demands[1:], minlength=4)
+    assert loads.max() - loads.min() <= 3
+
+def test_cluster_stops_rejects_unknown_method():
+    _, lats, lons = instance(5)
+    with pytest.raises(ValueError):
+        cluster_stops(lats, lons, 2, method="grid")
+
+def test_subproblem_keeps_depot_first_and_per_node_data():
+    data, _, _ = instance(6)
+    data.update(demands=[0, 1, 2, 3, 4, 5], vehicle_capacities=[10, 20])
+    sub = subproblem(data, [4, 2], vehicle_id=1)
+    assert sub["distance_matrix"][1, 2] == data["distance_matrix"][4, 2]
+    assert sub["demands"] == [0, 4, 2] and sub["vehicle_capacities"] == [20] and sub["depot"] == 0
+
+def test_clustered_solve_splits_budget_across_waves(monkeypatch):
+    data, lats, lons = instance(61, num_vehicles=20)
+    limits = []
+    def fake_solve_vrp(data, budget, time_limit_seconds):
+        limits.append(time_limit_seconds)
+        return {"status": "success", "routes": [list(range(len(data["distance_matrix"]))) + [0]], "route_distances": [0],
+                "objective_value": 0, "dropped_nodes": [], "message": "Solution found."}
+    monkeypatch.setattr(vrp_solver, "solve_vrp", fake_solve_vrp)
+    result = solve_vrp_clustered(data, lats, lons, time_limit_seconds=10, max_workers=1)
+    assert result["status"] == "success" and len(limits) == 20
+    assert sum(limits) == pytest.approx(10)
+
+
+@requires_ortools
+def test_solve_vrp_visits_every_stop_once():
+    data, _, _ = instance()
+    result = solve_vrp(data, time_limit_seconds=1)
+    assert result["status"] == "success" and result["dropped_nodes"] == []
+    assert visited_stops(result) == list(range(1, 25))
+    assert all(route[0] == 0 and route[-1] == 0 for route in result["routes"] if route)
+    assert result["max_route_distance"] == max(result["route_distances"])
+
+@requires_ortools
+def test_random_seed_maps_routes_back_to_original_nodes():
+    data, _, _ = instance()
+    result = solve_vrp(data, time_limit_seconds=1, random_seed=7)
+    assert result["status"] == "success" and visited_stops(result) == list(range(1, 25))
+    matrix = data["distance_matrix"]
+    for route, distance in zip(result["routes"], result["route_distances"]):
+        assert sum(matrix[a, b] for a, b in zip(route, route[1:])) == distance
+
+@requires_ortools
+def test_warm_start_from_previous_routes():
+    data, _, _ = instance()
+    cold = solve_vrp(data, time_limit_seconds=1)
+    warm = solve_vrp(data, time_limit_seconds=1, initial_routes=[route[1:-1] for route in cold["routes"]])
+    assert warm["status"] == "success" and warm["warm_started"]
+    assert warm["objective_value"] <= cold["objective_value"]
+
+@requires_ortools
+def test_capacity_limits_each_route():
+    data, _, _ = instance()
+    data.update(demands=[0] + [1] * 24, vehicle_capacities=[9, 9, 9])
+    result = solve_vrp(data, time_limit_seconds=1)
+    assert result["status"] == "success" and result["dropped_nodes"] == []
+    assert all(len(route) - 2 <= 9 for route in result["routes"] if route)
+
+@requires_ortools
+def test_clustered_solve_covers_all_stops():
+    data, lats, lons = instance(61, num_vehicles=20)
+    result = solve_vrp_clustered(data, lats, lons, time_limit_seconds=1, max_workers=1)
+    assert result["status"] == "success"
+    assert sorted(visited_stops(result) + result["dropped_nodes"]) == list(range(1, 61))
+
+@requires_ortools
+def test_solve_many_keeps_job_order():
+    jobs = [dict(data=instance(num_nodes=n, num_vehicles=1, seed=n)[0], time_limit_seconds=1) for n in (5, 8, 11)]
+    results = solve_many(jobs, max_workers=2)
+    assert results is not None and [len(visited_stops(result)) for result in results] == [4, 7, 10]
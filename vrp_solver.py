@@ -0,0 +1,395 @@
+# =============================================================================
+# OR-Tools VRP Solver (shared by int.py and bench_vrp.py)
+# =============================================================================
+# Pure model building and solving: no Streamlit, BigQuery or network access, so it
+# can be imported by benchmarks and by worker processes.
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    from ortools.constraint_solver import routing_enums_pb2
+    from ortools.constraint_solver import pywrapcp
+    ORTOOLS_AVAILABLE = True
+except ImportError:
+    ORTOOLS_AVAILABLE = False
+
+logger = logging.getLogger("IntegratedApp") # Same logger as the app so solver logs stay together
+
+# --- Distance Config ---
+UNROUTABLE_DISTANCE = 9999999 # Sentinel used for unroutable elements
+HAVERSINE_ROAD_FACTOR = 1.3 # Typical urban road circuity applied to great-circle distances
+EARTH_RADIUS_METERS = 6371008.8
+
+# --- Model Config ---
+MAX_ROUTE_DISTANCE_METERS = 3000000
+GLOBAL_SPAN_COST_COEFFICIENT = 100
+
+# --- Capacity / Time Window (CVRPTW) Config ---
+AVERAGE_SPEED_METERS_PER_SECOND = 8.33 # ~30 km/h urban delivery speed
+SERVICE_TIME_SECONDS = 600 # Time spent at each store
+DEFAULT_TIME_WINDOW = (8 * 3600, 18 * 3600) # 08:00-18:00, seconds since midnight
+MAX_WAIT_SECONDS = 3600 # Allowed idle time before a window opens
+DROP_PENALTY = 10000000 # Cost of leaving a stop unserved; keeps over-constrained weeks solvable
+
+# --- Solve Budget Config ---
+# A warm start from last week's routes begins near the optimum, so it gets a much shorter search
+VRP_SOLVE_BUDGETS = {
+    "fast": {"time_limit_seconds": 5, "warm_start_time_limit_seconds": 2},
+    "balanced": {"time_limit_seconds": 30, "warm_start_time_limit_seconds": 5},
+    "full": {"time_limit_seconds": 30, "warm_start_time_limit_seconds": 30},
+}
+VRP_DEFAULT_BUDGET = "balanced"
+
+# --- Portfolio Config ---
+# Tried in order; only as many as there are worker processes run, so wall-clock time stays one budget.
+# random_seed shuffles node labels, which changes the solver's tie-breaking (OR-Tools routing has no seed).
+VRP_PORTFOLIO = [
+    {"first_solution_strategy": "PATH_CHEAPEST_ARC", "metaheuristic": "GUIDED_LOCAL_SEARCH", "random_seed": None},
+    {"first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION", "metaheuristic": "GUIDED_LOCAL_SEARCH", "random_seed": None},
+    {"first_solution_strategy": "SAVINGS", "metaheuristic": "SIMULATED_ANNEALING", "random_seed": None},
+    {"first_solution_strategy": "PATH_CHEAPEST_ARC", "metaheuristic": "TABU_SEARCH", "random_seed": None},
+    {"first_solution_strategy": "PATH_CHEAPEST_ARC", "metaheuristic": "GUIDED_LOCAL_SEARCH", "random_seed": 1},
+    {"first_solution_strategy": "CHRISTOFIDES", "metaheuristic": "GUIDED_LOCAL_SEARCH", "random_seed": 2},
+    {"first_solution_strategy": "GLOBAL_CHEAPEST_ARC", "metaheuristic": "GUIDED_LOCAL_SEARCH", "random_seed": 3},
+    {"first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION", "metaheuristic": "SIMULATED_ANNEALING", "random_seed": 4},
+]
+
+# --- Decomposition (cluster-first, route-second) Config ---
+CLUSTER_METHODS = ("sweep", "kmeans")
+KMEANS_MAX_ITERATIONS = 100
+KMEANS_BALANCE_SLACK = 1.1 # Each k-means cluster may take up to 110% of an even share of the demand
+
+# --- Worker Pool Config ---
+POOL_OVERHEAD_SECONDS = 60 # Interpreter/OR-Tools start-up allowance on top of the solve time before a pool is abandoned
+
+
+def haversine_distance_matrix(lats, lons, road_factor: float = HAVERSINE_ROAD_FACTOR) -> np.ndarray:
+    """Vectorized great-circle distance matrix in meters, scaled by a road circuity factor."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64)); lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]; dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2.0) ** 2
+    meters = 2.0 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * road_factor
+    return np.rint(meters).astype(np.int64)
+
+def to_cost_matrix(distance_matrix, num_nodes: int) -> Optional[np.ndarray]:
+    """Validates a distance matrix once and returns it as a contiguous int64 array."""
+    if distance_matrix is None: return None
+    try:
+        cost_matrix = np.ascontiguousarray(distance_matrix, dtype=np.int64)
+    except (ValueError, TypeError) as e:
+        logger.error(f"VRP: Distance matrix is not numeric/rectangular: {e}"); return None
+    if cost_matrix.shape != (num_nodes, num_nodes):
+        logger.error(f"VRP: Distance matrix shape {cost_matrix.shape} != ({num_nodes}, {num_nodes})."); return None
+    if (cost_matrix < 0).any():
+        logger.warning("VRP: Negative distances found; treating them as unroutable.")
+        cost_matrix[cost_matrix < 0] = UNROUTABLE_DISTANCE
+    return cost_matrix
+
+def travel_time_matrix(cost_matrix: np.ndarray, service_times=None, speed_mps: float = AVERAGE_SPEED_METERS_PER_SECOND) -> np.ndarray:
+    """Converts meters to seconds of driving, plus the service time at the origin stop."""
+    seconds = np.rint(cost_matrix / speed_mps).astype(np.int64)
+    if service_times is not None: seconds += np.asarray(service_times, dtype=np.int64)[:, None]
+    np.fill_diagonal(seconds, 0)
+    return seconds
+
+def register_transit_matrix(routing, manager, matrix: np.ndarray) -> int:
+    """Registers a node matrix with OR-Tools so arc costs are evaluated natively in C++."""
+    if hasattr(routing, "RegisterTransitMatrix"): # OR-Tools >= 9.8: no Python callback during search
+        return routing.RegisterTransitMatrix(matrix.tolist())
+    rows = matrix.tolist() # Older OR-Tools: plain nested-list lookup, shape already validated
+    return routing.RegisterTransitCallback(lambda from_index, to_index: rows[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)])
+
+def build_search_parameters(budget: str = VRP_DEFAULT_BUDGET, time_limit_seconds: Optional[int] = None, warm_start: bool = False,
+                            first_solution_strategy: str = "PATH_CHEAPEST_ARC", metaheuristic: str = "GUIDED_LOCAL_SEARCH"):
+    """Builds OR-Tools search parameters for a named solve budget, optionally overriding its time limit."""
+    budget_cfg = VRP_SOLVE_BUDGETS.get(budget)
+    if budget_cfg is None:
+        logger.warning(f"VRP: Unknown budget '{budget}', using '{VRP_DEFAULT_BUDGET}'."); budget_cfg = VRP_SOLVE_BUDGETS[VRP_DEFAULT_BUDGET]
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.Value.Value(first_solution_strategy)
+    search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.Value.Value(metaheuristic)
+    budget_seconds = budget_cfg["warm_start_time_limit_seconds"] if warm_start else budget_cfg["time_limit_seconds"]
+    search_parameters.time_limit.FromMilliseconds(int(1000 * (time_limit_seconds or budget_seconds)))
+    return search_parameters
+
+def build_routing_model(data: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Builds the RoutingIndexManager/RoutingModel pair for a VRP data dict.
+
+    Required keys: distance_matrix (int64 ndarray), num_vehicles, depot. Optional keys
+    demands + vehicle_capacities add a "Capacity" dimension; time_windows (+ service_times)
+    add a "Time" dimension. Constrained models let stops be dropped at DROP_PENALTY.
+    """
+    cost_matrix = data["distance_matrix"]; num_nodes = len(cost_matrix); depot = data["depot"]
+    manager = pywrapcp.RoutingIndexManager(num_nodes, data["num_vehicles"], depot)
+    routing = pywrapcp.RoutingModel(manager)
+    transit_callback_index = register_transit_matrix(routing, manager, cost_matrix)
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+    routing.AddDimension(transit_callback_index, 0, MAX_ROUTE_DISTANCE_METERS, True, "Distance")
+    routing.GetDimensionOrDie("Distance").SetGlobalSpanCostCoefficient(GLOBAL_SPAN_COST_COEFFICIENT)
+
+    constrained = False
+    if data.get("demands") is not None:
+        demand_callback_index = routing.RegisterUnaryTransitVector([int(d) for d in data["demands"]])
+        routing.AddDimensionWithVehicleCapacity(demand_callback_index, 0, [int(c) for c in data["vehicle_capacities"]], True, "Capacity")
+        constrained = True
+    if data.get("time_windows") is not None:
+        time_windows = data["time_windows"]
+        time_callback_index = register_transit_matrix(routing, manager, travel_time_matrix(cost_matrix, data.get("service_times")))
+        routing.AddDimension(time_callback_index, MAX_WAIT_SECONDS, int(max(end for _, end in time_windows)), False, "Time")
+        time_dimension = routing.GetDimensionOrDie("Time")
+        for node, (start, end) in enumerate(time_windows):
+            if node != depot: time_dimension.CumulVar(manager.NodeToIndex(node)).SetRange(int(start), int(end))
+        for vehicle_id in range(data["num_vehicles"]):
+            for index in (routing.Start(vehicle_id), routing.End(vehicle_id)):
+                time_dimension.CumulVar(index).SetRange(int(time_windows[depot][0]), int(time_windows[depot][1]))
+                routing.AddVariableMinimizedByFinalizer(time_dimension.CumulVar(index))
+        constrained = True
+    if constrained:
+        for node in range(num_nodes):
+            if node != depot: routing.AddDisjunction([manager.NodeToIndex(node)], DROP_PENALTY)
+    return manager, routing
+
+def extract_routes(data: Dict[str, Any], manager, routing, solution) -> Dict[str, Any]:
+    """Reads per-vehicle node sequences (depot to depot) and distances from a solution; unused vehicles get []."""
+    distance_dimension = routing.GetDimensionOrDie("Distance")
+    routes, route_distances, visited = [], [], set()
+    for vehicle_id in range(data["num_vehicles"]):
+        if not routing.IsVehicleUsed(solution, vehicle_id): routes.append([]); route_distances.append(0); continue
+        index = routing.Start(vehicle_id); nodes = []
+        while not routing.IsEnd(index):
+            nodes.append(manager.IndexToNode(index)); index = solution.Value(routing.NextVar(index))
+        nodes.append(manager.IndexToNode(index)); visited.update(nodes)
+        routes.append(nodes); route_distances.append(solution.Value(distance_dimension.CumulVar(index)))
+    dropped_nodes = [node for node in range(len(data["distance_matrix"])) if node not in visited]
+    return {"routes": routes, "route_distances": route_distances, "dropped_nodes": dropped_nodes}
+
+def permute_nodes(data: Dict[str, Any], random_seed: int) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Relabels non-depot nodes randomly; returns the permuted data and perm (new node -> original node)."""
+    num_nodes = len(data["distance_matrix"]); depot = data["depot"]
+    others = np.array([node for node in range(num_nodes) if node != depot], dtype=np.int64)
+    perm = np.insert(np.random.default_rng(random_seed).permutation(others), depot, depot)
+    permuted = dict(data); permuted["distance_matrix"] = np.ascontiguousarray(data["distance_matrix"][np.ix_(perm, perm)])
+    for key in ("demands", "time_windows", "service_times"):
+        if data.get(key) is not None: permuted[key] = [data[key][old] for old in perm]
+    return permuted, perm
+
+def solve_vrp(data: Dict[str, Any], budget: str = VRP_DEFAULT_BUDGET, time_limit_seconds: Optional[int] = None,
+              initial_routes: Optional[List[List[int]]] = None, first_solution_strategy: str = "PATH_CHEAPEST_ARC",
+              metaheuristic: str = "GUIDED_LOCAL_SEARCH", random_seed: Optional[int] = None) -> Dict[str, Any]:
+    """Builds and solves a VRP, optionally warm-started from per-vehicle node lists (depots excluded).
+
+    Returns plain Python data (picklable) so callers can run this in worker processes.
+    """
+    result = {"status": "error", "message": "VRP solve failed.", "routes": None, "route_distances": None, "dropped_nodes": None,
+              "objective_value": None, "max_route_distance": None, "warm_started": False, "solve_seconds": None}
+    if not ORTOOLS_AVAILABLE:
+        result["message"] = "OR-Tools library not available."; return result
+    perm = None
+    if random_seed is not None:
+        data, perm = permute_nodes(data, random_seed)
+        if initial_routes is not None:
+            new_label = {int(old): new for new, old in enumerate(perm)}
+            initial_routes = [[new_label[node] for node in route] for route in initial_routes]
+    started = time.perf_counter()
+    try:
+        manager, routing = build_routing_model(data)
+        search_parameters = build_search_parameters(budget, time_limit_seconds, initial_routes is not None, first_solution_strategy, metaheuristic)
+        initial_solution = None
+        if initial_routes is not None:
+            routing.CloseModelWithParameters(search_parameters)
+            initial_solution = routing.ReadAssignmentFromRoutes(initial_routes, True)
+            if initial_solution is None:
+                logger.warning("VRP: Initial routes infeasible for this model; cold start.")
+                search_parameters = build_search_parameters(budget, time_limit_seconds, False, first_solution_strategy, metaheuristic)
+        logger.info(f"VRP: Solving {len(data['distance_matrix'])} nodes, {data['num_vehicles']} vehicles (budget '{budget}', warm start: {initial_solution is not None})...")
+        if initial_solution is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters); result["warm_started"] = True
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+    except Exception as e:
+        logger.error(f"VRP: Error during OR-Tools setup/solving: {e}", exc_info=True)
+        result["message"] = f"OR-Tools engine error: {e}"; return result
+    result["solve_seconds"] = time.perf_counter() - started
+
+    if not solution:
+        try: status_name = routing_enums_pb2.RoutingSearchStatus.Value.Name(routing.status())
+        except Exception: status_name = f"UNKNOWN_{routing.status()}"
+        result["message"] = f"OR-Tools could not find solution. Status: {status_name}."; logger.warning(result["message"]); return result
+    result.update(extract_routes(data, manager, routing, solution))
+    if perm is not None: # Map labels back to the caller's node numbering
+        result["routes"] = [[int(perm[node]) for node in route] for route in result["routes"]]
+        result["dropped_nodes"] = sorted(int(perm[node]) for node in result["dropped_nodes"])
+    result["objective_value"] = solution.ObjectiveValue()
+    result["max_route_distance"] = max(result["route_distances"], default=0)
+    result["status"] = "success"; result["message"] = "Solution found."
+    return result
+
+def solve_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker-pool entry point: solve_vrp(**job)."""
+    return solve_vrp(**job)
+
+def run_pool(jobs: List[Dict[str, Any]], max_workers: int) -> List[Dict[str, Any]]:
+    """Runs solve_job over jobs in a forkserver (spawn on Windows) pool; only safe when __main__ re-imports cleanly."""
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    mp_context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver": mp_context.set_forkserver_preload(["vrp_solver"]) # Workers fork with OR-Tools already imported
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        return list(executor.map(solve_job, jobs))
+
+def solve_many(jobs: List[Dict[str, Any]], max_workers: int) -> Optional[List[Dict[str, Any]]]:
+    """Runs solve_vrp(**job) for each job in worker processes; results keep job order (None if the pool fails).
+
+    The pool is hosted by a fresh `python -m vrp_solver` process. The caller is usually the Streamlit
+    server, which is multithreaded (fork is unsafe) and whose __main__ is the app script (spawn and
+    forkserver workers would re-execute it), whereas this module re-imports without side effects.
+    """
+    slowest = max((job.get("time_limit_seconds") or VRP_SOLVE_BUDGETS.get(job.get("budget", VRP_DEFAULT_BUDGET), VRP_SOLVE_BUDGETS[VRP_DEFAULT_BUDGET])["time_limit_seconds"]
+                   for job in jobs), default=0)
+    timeout = math.ceil(len(jobs) / max_workers) * slowest + POOL_OVERHEAD_SECONDS
+    try:
+        completed = subprocess.run([sys.executable, "-m", "vrp_solver", str(max_workers)], input=pickle.dumps(jobs), stdout=subprocess.PIPE,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), timeout=timeout, check=True)
+        return pickle.loads(completed.stdout)
+    except Exception as e:
+        logger.error(f"VRP: Worker pool failed: {e}", exc_info=True); return None
+
+def solve_vrp_portfolio(data: Dict[str, Any], budget: str = VRP_DEFAULT_BUDGET, time_limit_seconds: Optional[int] = None,
+                        initial_routes: Optional[List[List[int]]] = None, configs: Optional[List[Dict[str, Any]]] = None,
+                        max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Solves the same VRP with several strategy/metaheuristic/seed configs in parallel and keeps the best objective.
+
+    Runs one config per worker process (at most one per CPU), so the wall-clock cost is one solve budget.
+    The returned result is the winning solve_vrp() result plus 'winning_config' and a 'portfolio' summary.
+    """
+    configs = list(configs or VRP_PORTFOLIO)
+    num_workers = max(1, min(len(configs), max_workers or os.cpu_count() or 1))
+    configs = configs[:num_workers]
+    if num_workers == 1:
+        result = solve_vrp(data, budget, time_limit_seconds, initial_routes, **configs[0])
+        result["winning_config"] = configs[0]; result["portfolio"] = [{**configs[0], "status": result["status"], "objective_value": result["objective_value"]}]
+        return result
+    logger.info(f"VRP: Portfolio solve with {num_workers} configurations in parallel.")
+    results = solve_many([dict(data=data, budget=budget, time_limit_seconds=time_limit_seconds, initial_routes=initial_routes, **cfg) for cfg in configs], num_workers)
+    if results is None:
+        logger.error("VRP: Portfolio worker pool failed; solving in-process with the default configuration.")
+        result = solve_vrp(data, budget, time_limit_seconds, initial_routes, **configs[0])
+        result["winning_config"] = configs[0]; result["portfolio"] = []
+        return result
+    summary = [{**cfg, "status": res["status"], "objective_value": res["objective_value"]} for cfg, res in zip(configs, results)]
+    solved = [(res["objective_value"], i) for i, res in enumerate(results) if res["status"] == "success"]
+    if not solved:
+        result = results[0]; result["winning_config"] = None; result["portfolio"] = summary; return result
+    _, best = min(solved)
+    result = results[best]; result["winning_config"] = configs[best]; result["portfolio"] = summary
+    logger.info(f"VRP: Portfolio winner {configs[best]} with objective {result['objective_value']}.")
+    return result
+
+def cluster_stops(lats, lons, num_clusters: int, depot: int = 0, method: str = "sweep", demands=None, random_seed: int = 0) -> np.ndarray:
+    """Assigns every non-depot node to one of num_clusters geographic clusters (depot gets -1).
+
+    'sweep' orders stops by polar angle around the depot and cuts equal-demand (or equal-count)
+    sectors, which keeps rider workloads balanced. 'kmeans' runs Lloyd's algorithm on Lat/Long, then
+    caps each cluster at KMEANS_BALANCE_SLACK times an even share.
+    """
+    lats = np.asarray(lats, dtype=np.float64); lons = np.asarray(lons, dtype=np.float64)
+    stops = np.array([node for node in range(len(lats)) if node != depot], dtype=np.int64)
+    labels = np.full(len(lats), -1, dtype=np.int64)
+    num_clusters = max(1, min(num_clusters, len(stops)))
+    if method == "kmeans":
+        points = np.column_stack([lats[stops], lons[stops] * np.cos(np.radians(lats[depot]))]) # Roughly equal-area axes
+        rng = np.random.default_rng(random_seed)
+        centers = points[rng.choice(len(points), num_clusters, replace=False)]
+        for _ in range(KMEANS_MAX_ITERATIONS):
+            assignment = np.argmin(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+            new_centers = np.array([points[assignment == k].mean(axis=0) if (assignment == k).any() else centers[k] for k in range(num_clusters)])
+            if np.allclose(new_centers, centers): break
+            centers = new_centers
+        # Lloyd's clusters can be badly unbalanced; re-assign greedily (most decisive stops first) to the
+        # nearest center that still has room so no rider gets much more than its share of the work
+        weights = np.ones(len(stops)) if demands is None else np.asarray(demands, dtype=np.float64)[stops]
+        room = np.full(num_clusters, weights.sum() / num_clusters * KMEANS_BALANCE_SLACK)
+        squared = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        preference = np.argsort(squared, axis=1)
+        margin = np.take_along_axis(squared, preference[:, 1:2], axis=1)[:, 0] - squared.min(axis=1) if num_clusters > 1 else np.zeros(len(stops))
+        for i in np.argsort(-margin, kind="stable"):
+            k = next((k for k in preference[i] if room[k] >= weights[i]), preference[i][np.argmax(room[preference[i]])])
+            assignment[i] = k; room[k] -= weights[i]
+        labels[stops] = assignment
+    elif method == "sweep":
+        angles = np.arctan2(lats[stops] - lats[depot], lons[stops] - lons[depot])
+        order = stops[np.argsort(angles, kind="stable")]
+        weights = np.ones(len(order)) if demands is None else np.maximum(np.asarray(demands, dtype=np.float64)[order], 1e-9)
+        cumulative = np.cumsum(weights) - weights / 2.0
+        labels[order] = np.minimum((cumulative / weights.sum() * num_clusters).astype(np.int64), num_clusters - 1)
+    else:
+        raise ValueError(f"Unknown cluster method '{method}'. Options: {', '.join(CLUSTER_METHODS)}")
+    return labels
+
+def subproblem(data: Dict[str, Any], nodes: List[int], vehicle_id: int) -> Dict[str, Any]:
+    """Extracts a single-vehicle VRP over [depot] + nodes, keeping capacity/time-window data."""
+    sub_nodes = [data["depot"]] + list(nodes)
+    sub = {"distance_matrix": np.ascontiguousarray(data["distance_matrix"][np.ix_(sub_nodes, sub_nodes)]), "num_vehicles": 1, "depot": 0}
+    for key in ("demands", "time_windows", "service_times"):
+        if data.get(key) is not None: sub[key] = [data[key][node] for node in sub_nodes]
+    if data.get("vehicle_capacities") is not None: sub["vehicle_capacities"] = [data["vehicle_capacities"][vehicle_id]]
+    return sub
+
+def solve_vrp_clustered(data: Dict[str, Any], lats, lons, budget: str = VRP_DEFAULT_BUDGET, time_limit_seconds: Optional[int] = None,
+                        method: str = "sweep", max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Cluster-first, route-second: one geographic cluster per vehicle, each solved as an independent TSP in parallel.
+
+    Returns the same structure as solve_vrp(), with routes/dropped nodes in the original node numbering,
+    so callers can format it exactly like a monolithic solve.
+    """
+    result = {"status": "error", "message": "Clustered VRP solve failed.", "routes": None, "route_distances": None, "dropped_nodes": None,
+              "objective_value": None, "max_route_distance": None, "warm_started": False, "solve_seconds": None}
+    started = time.perf_counter(); num_vehicles = data["num_vehicles"]
+    try:
+        labels = cluster_stops(lats, lons, num_vehicles, data["depot"], method, data.get("demands"))
+    except ValueError as e:
+        result["message"] = str(e); return result
+    clusters = [[int(node) for node in np.flatnonzero(labels == k)] for k in range(num_vehicles)]
+    num_clusters = max(1, sum(1 for nodes in clusters if nodes))
+    num_workers = max(1, min(num_clusters, max_workers or os.cpu_count() or 1))
+    budget_seconds = time_limit_seconds or VRP_SOLVE_BUDGETS.get(budget, VRP_SOLVE_BUDGETS[VRP_DEFAULT_BUDGET])["time_limit_seconds"]
+    # Clusters beyond the worker count queue up, so split the wall-clock budget across the waves; no floor,
+    # since a per-cluster minimum would overrun the budget (a single-vehicle TSP finds its first solution at once)
+    per_cluster_seconds = budget_seconds / math.ceil(num_clusters / num_workers)
+    jobs, job_vehicles = [], []
+    for vehicle_id, nodes in enumerate(clusters):
+        if not nodes: continue
+        jobs.append(dict(data=subproblem(data, nodes, vehicle_id), budget=budget, time_limit_seconds=per_cluster_seconds)); job_vehicles.append(vehicle_id)
+    logger.info(f"VRP: Cluster-first solve ({method}): {len(jobs)} clusters on {num_workers} workers, {per_cluster_seconds:.2f}s each.")
+    sub_results = solve_many(jobs, num_workers) if num_workers > 1 else None
+    if sub_results is None: sub_results = [solve_vrp(**job) for job in jobs]
+
+    routes: List[List[int]] = [[] for _ in range(num_vehicles)]; route_distances = [0] * num_vehicles; dropped, objective = [], 0
+    for vehicle_id, sub_result in zip(job_vehicles, sub_results):
+        sub_nodes = [data["depot"]] + clusters[vehicle_id]
+        if sub_result["status"] != "success":
+            logger.warning(f"VRP: Cluster {vehicle_id} unsolved: {sub_result['message']}"); dropped.extend(clusters[vehicle_id]); continue
+        if sub_result["routes"][0]: routes[vehicle_id] = [sub_nodes[node] for node in sub_result["routes"][0]]
+        route_distances[vehicle_id] = sub_result["route_distances"][0]; objective += sub_result["objective_value"]
+        dropped.extend(sub_nodes[node] for node in sub_result["dropped_nodes"])
+    if not any(routes):
+        result["message"] = "No cluster could be solved."; return result
+    result.update({"status": "success", "message": "Solution found.", "routes": routes, "route_distances": route_distances,
+                   "dropped_nodes": sorted(dropped), "objective_value": objective, "max_route_distance": max(route_distances),
+                   "solve_seconds": time.perf_counter() - started})
+    return result
+
+
+if __name__ == "__main__":
+    # Worker-pool host for solve_many(): pickled jobs on stdin, pickled results on stdout
+    pool_jobs = pickle.load(sys.stdin.buffer)
+    pickle.dump(run_pool(pool_jobs, int(sys.argv[1])), sys.stdout.buffer)